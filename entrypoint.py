@@ -4,85 +4,143 @@ import argparse
 import os
 import textwrap
 import sys
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, NoReturn
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Mapping, NoReturn, Tuple
 
-import jinja2
-import yaml
+if TYPE_CHECKING:
+    import jinja2
 
 
-def get_abs_path_for_file_relative_to_config_file(config_file:str, file_path:str, *, prefix:str="") -> str:
+@lru_cache(maxsize=None)
+def _get_yaml_loader() -> type:
+    try:
+        from yaml import CSafeLoader as loader
+    except ImportError:
+        from yaml import SafeLoader as loader
+
+    return loader
+
+
+def _load_template_source(template:str) -> Tuple[str, str, Callable[[], bool]]:
+    source = Path(template).read_bytes().decode("utf-8")
+    return source, template, lambda: True
+
+
+@lru_cache(maxsize=None)
+def _get_jinja_environment() -> "jinja2.Environment":
+    import jinja2
+
+    bytecode_cache = None
+    cache_dir = os.environ.get("ENTRYPOINT_JINJA_CACHE")
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        bytecode_cache = jinja2.FileSystemBytecodeCache(directory=cache_dir)
+
+    class Environment(jinja2.Environment):
+        def join_path(self, template:str, parent:str) -> str:
+            # Includes and imports are relative to the including template, not the cwd
+            return os.path.join(os.path.dirname(parent), template)
+
+    return Environment(loader=jinja2.FunctionLoader(_load_template_source), auto_reload=False,
+        cache_size=-1, bytecode_cache=bytecode_cache)
+
+
+def get_config_file_basedir(config_file:str, *, prefix:str="") -> str:
     if prefix:
         config_file_path = Path(config_file)
         if config_file_path.is_absolute():
             config_file_path = config_file_path.relative_to(config_file_path.anchor)
-        basedir = Path(prefix) / config_file_path.parent
-    else:
-        basedir = Path(config_file).absolute().parent
+        return str(Path(prefix) / config_file_path.parent)
 
-    final_path = Path(basedir) / file_path
-    return str(final_path)
+    # Path drops '.' parts but keeps '..', so it's resolved by the OS through symlinked directories
+    return str(Path(config_file).absolute().parent)
 
 
 def read_config_file(config_path:str) -> Dict[str, str]:
-    with open(config_path) as fh:
-        config:Dict = yaml.load(fh, yaml.Loader)
+    import yaml
+
+    with open(config_path, "rb") as fh:
+        config:Dict = yaml.load(fh, _get_yaml_loader())
 
+    basedir = Path(get_config_file_basedir(config_path))
     return {
-        get_abs_path_for_file_relative_to_config_file(config_path, template_src): template_dst
+        str(basedir / template_src): template_dst
         for template_src, template_dst in config.items()
     }
 
 
 def read_properties_from_files(*property_files:str) -> Dict:
+    import yaml
+
     props = {}
     for file_path in property_files:
-        with open(file_path) as fh:
-            contents:Dict = yaml.load(fh, yaml.Loader)
+        with open(file_path, "rb") as fh:
+            contents:Dict = yaml.load(fh, _get_yaml_loader())
             props.update(contents)
 
     return props
 
 
-def render_template(file_path:str, **properties:Any) -> str:
-    with open(file_path) as fh:
-        return jinja2.Template(fh.read()).render({
-            "env": os.environ,
-            "props": properties,
-        })
+def render_template(file_path:str, env:Mapping[str, str], properties:Mapping[str, Any]) -> str:
+    # Relative paths still need a cwd-based key so the template cache stays correct across a chdir
+    template_path = os.path.join(os.getcwd(), file_path)
+    return _get_jinja_environment().get_template(template_path).render({
+        "env": env,
+        "props": properties,
+    })
 
 
 def render_files(template_config:Dict[str, str], props:Dict) -> Dict[str, str]:
-    output = {}
-    for template_src, template_dst in template_config.items():
-        output[template_dst] = render_template(template_src, **props)
+    if not template_config:
+        return {}
 
-    return output
+    from concurrent.futures import ThreadPoolExecutor
 
+    # Set up the environment before spawning threads so it's only created once
+    _get_jinja_environment()
 
-def write_file(file_path:str, contents:str, overwrite:bool=False) -> bool:
-    if not overwrite and Path(file_path).exists():
-        return False
+    env = dict(os.environ)
+
+    with ThreadPoolExecutor(max_workers=min(8, len(template_config))) as executor:
+        futures = [
+            (template_dst, executor.submit(render_template, template_src, env, props))
+            for template_src, template_dst in template_config.items()
+        ]
 
-    with open(file_path, "w") as fh:
+        return {template_dst: future.result() for template_dst, future in futures}
+
+
+def write_file(file_path:str, contents:str, overwrite:bool=False) -> bool:
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+    try:
+        fd = os.open(file_path, flags if overwrite else flags | os.O_EXCL, 0o666)
+    except FileExistsError:
+        # O_EXCL also fails on dangling symlinks, those are still written through
+        if os.path.exists(file_path):
+            return False
+        fd = os.open(file_path, flags, 0o666)
+
+    with os.fdopen(fd, "w") as fh:
         fh.write(contents)
 
     return True
 
 
 def write_rendered_templates(rendered_files, dry_run:bool, overwrite:bool) -> None:
-    print("Rendering templates")
+    lines = ["Rendering templates\n"]
 
-    for path, contents in rendered_files.items():
-        print(f"{path}: ", end="")
+    try:
         if dry_run:
-            print("\n", textwrap.indent(contents, "  "), "\n", sep="")
-            continue
-
-        if write_file(path, contents, overwrite):
-            print("OK")
+            for path, contents in rendered_files.items():
+                lines.append(f"{path}: \n{textwrap.indent(contents, '  ')}\n\n")
         else:
-            print("Skipped")
+            for path, contents in rendered_files.items():
+                status = "OK" if write_file(path, contents, overwrite) else "Skipped"
+                lines.append(f"{path}: {status}\n")
+    finally:
+        sys.stdout.writelines(lines)
+        sys.stdout.flush()
 
 
 def launch_command(*cmd_args) -> NoReturn:
@@ -104,20 +162,21 @@ def main(args:argparse.Namespace, *cmd_args:str) -> None:
         launch_command(*cmd_args)
 
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter,
-        description=textwrap.dedent("""
-        Docker entrypoint script that renders jinja2 templates and writes them to a destination.
-        The configuration file is a YAML file with an object where key/values represent:
+_DESCRIPTION = """\
+Docker entrypoint script that renders jinja2 templates and writes them to a destination.
+The configuration file is a YAML file with an object where key/values represent:
+
+TEMPLATE_FILE_PATH: DESTINATION_PATH
 
-        TEMPLATE_FILE_PATH: DESTINATION_PATH
+Template paths are relative to the configuration file.
+Use '--' to specify a command that will be run after the rendering is complete.
 
-        Template paths are relative to the configuration file.
-        Use '--' to specify a command that will be run after the rendering is complete.
+Example usage:
+  ./entrypoint.py --config prod.conf -- apachectl -D FOREGROUND"""
 
-        Example usage:
-          ./entrypoint.py --config prod.conf -- apachectl -D FOREGROUND
-        """).strip())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter, description=_DESCRIPTION)
     parser.add_argument("--config", default="", type=str,
         help="Template configuration file (default: %(default)s)")
     parser.add_argument("--props", metavar="PROPERTY_FILE", type=str, nargs="*", default=tuple(),
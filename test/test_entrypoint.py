@@ -3,9 +3,11 @@ import pathlib
 import textwrap
 
 import pytest
+import yaml
 
 from entrypoint import (
-    get_abs_path_for_file_relative_to_config_file,
+    _get_jinja_environment,
+    get_config_file_basedir,
     read_config_file,
     read_properties_from_files,
     render_files,
@@ -43,23 +45,17 @@ RENDERED_TEMPLATES = {
 
 
 @pytest.mark.parametrize(
-    "config_file_path,template_path,result",
+    "config_file_path,result",
     [
-        ("config.yml", "example.conf.j2", "/opt/example.conf.j2"),
-        ("dir/config.yml", "example.conf.j2", "/opt/dir/example.conf.j2"),
-        ("/tmp/config.yml", "example.conf.j2", "/opt/tmp/example.conf.j2"),
-
-        ("config.yml", "templates/example.conf.j2", "/opt/templates/example.conf.j2"),
-        ("dir/config.yml", "templates/example.conf.j2", "/opt/dir/templates/example.conf.j2"),
-        ("/tmp/config.yml", "templates/example.conf.j2", "/opt/tmp/templates/example.conf.j2"),
-
-        ("config.yml", "/var/example.conf.j2", "/var/example.conf.j2"),
-        ("dir/config.yml", "/var/example.conf.j2", "/var/example.conf.j2"),
-        ("/tmp/config.yml", "/var/example.conf.j2", "/var/example.conf.j2"),
+        ("config.yml", "/opt"),
+        ("./config.yml", "/opt"),
+        ("dir/config.yml", "/opt/dir"),
+        ("dir//config.yml", "/opt/dir"),
+        ("/tmp/config.yml", "/opt/tmp"),
     ]
 )
-def test_get_path_relative_to_file(config_file_path:str, template_path:str, result:str):
-    assert get_abs_path_for_file_relative_to_config_file(config_file_path, template_path, prefix="/opt") == result
+def test_get_config_file_basedir(config_file_path:str, result:str):
+    assert get_config_file_basedir(config_file_path, prefix="/opt") == result
 
 
 def test_read_template_config_file():
@@ -73,6 +69,26 @@ def test_read_template_config_file():
     }
 
 
+@pytest.mark.parametrize("template_config_file_path", ["./test/resources/config.yml", "test//resources/config.yml"])
+def test_read_template_config_file_normalizes_path(template_config_file_path:str):
+    template_basedir = os.path.join(os.getcwd(), "test/resources")
+
+    assert read_config_file(template_config_file_path) == {
+        os.path.join(template_basedir, "templates/example.conf.j2"): "example.conf",
+        os.path.join(template_basedir, "templates/example2.conf.j2"): "example2.conf",
+    }
+
+
+def test_read_template_config_file_with_absolute_template_path(tmp_path:pathlib.Path):
+    config_file = tmp_path / "config.yml"
+    config_file.write_text("/var/example.conf.j2: example.conf\ntemplates/example2.conf.j2: example2.conf\n")
+
+    assert read_config_file(str(config_file)) == {
+        "/var/example.conf.j2": "example.conf",
+        str(tmp_path / "templates/example2.conf.j2"): "example2.conf",
+    }
+
+
 def test_read_properties_from_files():
     props = read_properties_from_files(
         "test/resources/props/file1.yml",
@@ -86,10 +102,53 @@ def test_read_properties_from_files():
     }
 
 
+def test_read_properties_from_files_reports_file_on_error(tmp_path:pathlib.Path):
+    bad_file = tmp_path / "bad.yml"
+    bad_file.write_text("prop1: value1\nprop2: [\n")
+
+    with pytest.raises(yaml.MarkedYAMLError, match=f'in "{bad_file}", line 3'):
+        read_properties_from_files("test/resources/props/file1.yml", str(bad_file))
+
+
 def test_render_template():
     os.environ["ENV1"] = "ENV1 SET"
     template_src, template_dst = tuple(TEMPLATE_CONFIG.items())[0]
-    assert render_template(template_src, **PROPS) == RENDERED_TEMPLATES[template_dst]
+    assert render_template(template_src, os.environ, PROPS) == RENDERED_TEMPLATES[template_dst]
+
+
+def test_render_template_missing_file():
+    with pytest.raises(FileNotFoundError):
+        render_template("test/resources/templates/missing.j2", {}, PROPS)
+
+
+def test_render_template_with_include(tmp_path:pathlib.Path, monkeypatch:pytest.MonkeyPatch):
+    (tmp_path / "templates").mkdir()
+    (tmp_path / "templates" / "base.j2").write_text("{% include 'partial.j2' %}")
+    (tmp_path / "templates" / "partial.j2").write_text("{{ props['prop1'] }}")
+    monkeypatch.chdir(tmp_path)
+
+    assert render_template("templates/base.j2", {}, PROPS) == "prop1 SET"
+
+
+def test_render_files_with_env_property(tmp_path:pathlib.Path, monkeypatch:pytest.MonkeyPatch):
+    monkeypatch.setenv("ENV1", "ENV1 SET")
+    template = tmp_path / "env.j2"
+    template.write_text("{{ props['env'] }} {{ env['ENV1'] }}")
+
+    assert render_files({str(template): "env.conf"}, {"env": "prod"}) == {"env.conf": "prod ENV1 SET"}
+
+
+def test_render_template_with_bytecode_cache(tmp_path:pathlib.Path, monkeypatch:pytest.MonkeyPatch):
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setenv("ENTRYPOINT_JINJA_CACHE", str(cache_dir))
+    _get_jinja_environment.cache_clear()
+
+    try:
+        template_src, template_dst = tuple(TEMPLATE_CONFIG.items())[0]
+        assert render_template(template_src, {"ENV1": "ENV1 SET"}, PROPS) == RENDERED_TEMPLATES[template_dst]
+        assert list(cache_dir.glob("*.cache"))
+    finally:
+        _get_jinja_environment.cache_clear()
 
 
 def test_render_files():
@@ -141,3 +200,65 @@ def test_write_rendered_templates_with_overwrite(tmp_path:pathlib.Path):
     for file, contents in rendered_templates.items():
         with open(file) as fh:
             assert fh.read() == contents
+
+
+def test_write_rendered_templates_output(tmp_path:pathlib.Path, capsys:pytest.CaptureFixture):
+    rendered_templates = rebase_test_rendered_templates(tmp_path)
+
+    existing_file = list(rendered_templates)[0]
+    with open(existing_file, "w") as fh:
+        fh.write("SKIP")
+
+    write_rendered_templates(rendered_templates, dry_run=False, overwrite=False)
+
+    paths = list(rendered_templates)
+    assert capsys.readouterr().out == f"Rendering templates\n{paths[0]}: Skipped\n{paths[1]}: OK\n"
+
+
+def test_write_rendered_templates_dry_run(tmp_path:pathlib.Path, capsys:pytest.CaptureFixture):
+    rendered_templates = rebase_test_rendered_templates(tmp_path)
+    write_rendered_templates(rendered_templates, dry_run=True, overwrite=False)
+
+    for file in rendered_templates:
+        assert not os.path.exists(file)
+
+    out = capsys.readouterr().out
+    for file, contents in rendered_templates.items():
+        assert f"{file}: \n{textwrap.indent(contents, '  ')}\n\n" in out
+
+
+def test_write_rendered_templates_through_dangling_symlink(tmp_path:pathlib.Path):
+    rendered_templates = rebase_test_rendered_templates(tmp_path)
+
+    existing_file = list(rendered_templates)[0]
+    symlink_target = tmp_path / "target.txt"
+    os.symlink(symlink_target, existing_file)
+
+    write_rendered_templates(rendered_templates, dry_run=False, overwrite=False)
+
+    with open(symlink_target) as fh:
+        assert fh.read() == rendered_templates[existing_file]
+
+
+def test_render_template_relative_to_symlinked_config_dir(tmp_path:pathlib.Path):
+    (tmp_path / "real" / "sub").mkdir(parents=True)
+    (tmp_path / "real" / "shared").mkdir()
+    (tmp_path / "real" / "shared" / "t.j2").write_text("{{ props['prop1'] }}")
+    os.symlink(tmp_path / "real" / "sub", tmp_path / "link_parent")
+
+    config_file = tmp_path / "link_parent" / "config.yml"
+    config_file.write_text("../shared/t.j2: t.conf\n")
+
+    config = read_config_file(str(config_file))
+    assert render_files(config, PROPS) == {"t.conf": "prop1 SET"}
+
+
+def test_write_rendered_templates_output_on_error(tmp_path:pathlib.Path, capsys:pytest.CaptureFixture):
+    rendered_templates = rebase_test_rendered_templates(tmp_path)
+    first_file = list(rendered_templates)[0]
+    rendered_templates[str(tmp_path / "missing" / "file.conf")] = "contents"
+
+    with pytest.raises(FileNotFoundError):
+        write_rendered_templates(rendered_templates, dry_run=False, overwrite=False)
+
+    assert capsys.readouterr().out.startswith(f"Rendering templates\n{first_file}: OK\n")